@@ -0,0 +1,806 @@
+import math
+import time
+from collections import defaultdict
+from fractions import Fraction
+
+import numpy as np
+
+from equipment import (
+    DOFUS_TROPHY_LIMIT,
+    DOFUS_TROPHY_TYPES,
+    GROUPED_TYPES,
+    extract_conditions,
+    parse_condition,
+    set_bonus_keys,
+    stat_coefficients,
+    type_limit,
+)
+
+
+EPSILON = 1e-6
+
+
+class SearchTimeout(Exception):
+    """Raised when the search runs past its time limit."""
+
+
+def _condition_holds(total, op, value):
+    if op == '>':
+        return total >= value + 1 - EPSILON
+    if op == '>=':
+        return total >= value - EPSILON
+    if op == '<':
+        return total <= value - 1 + EPSILON
+    if op == '<=':
+        return total <= value + EPSILON
+    return value - EPSILON <= total <= value + EPSILON
+
+
+def _can_meet(highest, lowest, op, value):
+    """Whether a stat known to end between `lowest` and `highest` can still meet `op value`."""
+    if op in ('>', '>=', '=') and not _condition_holds(highest, '>' if op == '>' else '>=', value):
+        return False
+    if op in ('<', '<=', '=') and not _condition_holds(lowest, '<' if op == '<' else '<=', value):
+        return False
+    return True
+
+
+def _reachable_bonus(increments):
+    """Cumulated positive set bonus per number of items worn (0 and 1 item give nothing).
+
+    `increments` holds the tiers of each set as rows, padded with zeros.
+    """
+    increments = np.maximum(increments, 0)
+    return np.concatenate([np.zeros((len(increments), 2)), np.cumsum(increments, axis=1)], axis=1)
+
+
+def _share_tables(reachable):
+    """share[s][n][f]: best average bonus per extra item for set s with n items, f more allowed.
+
+    A set worn with n items that can still get up to f more from the
+    remaining slots ends with at most reachable[n] + (extra items) * share[n][f].
+    """
+    n_sets, width = reachable.shape
+    size = width - 1
+    share = np.zeros((n_sets, width, width))
+    for n in range(size):
+        gains = (reachable[:, n + 1:] - reachable[:, n:n + 1]) / np.arange(1, size - n + 1)
+        share[:, n, 1:size - n + 1] = np.maximum.accumulate(np.maximum(gains, 0), axis=1)
+        share[:, n, size - n + 1:] = share[:, n, size - n:size - n + 1]
+    return share
+
+
+def _first_shares(reachable):
+    """share[s][0] of `_share_tables` alone, for sets not started yet."""
+    gains = reachable[:, 1:] / np.arange(1, reachable.shape[1])
+    return np.concatenate([np.zeros((len(reachable), 1)), np.maximum.accumulate(np.maximum(gains, 0), axis=1)], axis=1)
+
+
+def _score_step(values):
+    """Largest step every one of `values` is a multiple of, or 0 when there is none.
+
+    Stats are integers, so with weights such as 0.5 or 3 every objective is a
+    multiple of a step, and no selection beats the best one found by less.
+    """
+    fractions = [Fraction(value).limit_denominator(1000) for value in values]
+    if any(abs(float(fraction) - value) > EPSILON for fraction, value in zip(fractions, values)):
+        return 0.0
+    denominator = math.lcm(*(fraction.denominator for fraction in fractions))
+    return math.gcd(*(fraction.numerator * (denominator // fraction.denominator) for fraction in fractions)) / denominator
+
+
+def _top_sum(values, limit):
+    """Best total of at most `limit` of `values` (an empty slot is worth 0)."""
+    if limit == 1:
+        return max(0.0, float(values.max()))
+    values = np.maximum(values, 0)
+    if len(values) > limit:
+        values = np.partition(values, -limit)[-limit:]
+    return float(values.sum())
+
+
+def _groups_top_sum(values, starts, limits):
+    """Best total of the groups `values[starts[h]:starts[h + 1]]`, the single slots coming first."""
+    singles = limits.count(1)
+    total = 0.0
+    if singles:
+        total += float(np.maximum(np.maximum.reduceat(values[:starts[singles]], starts[:singles]), 0).sum())
+    for h in range(singles, len(limits)):
+        total += _top_sum(values[starts[h]:starts[h + 1]], limits[h])
+    return total
+
+
+def _fit_multipliers(dual, required):
+    """Coordinate descent on the Lagrangian dual of the "at least" rows.
+
+    For multipliers `lam` >= 0, `dual(lam)` bounds the objective of every
+    feasible selection and is convex in `lam`. The multipliers making this
+    bound smallest let the search prune on PA/PM and the minimum stats long
+    before the leaves. Along each row, the bracket is doubled until the dual
+    goes up again, then narrowed by golden section.
+    """
+    lam = np.zeros(len(required))
+    best = dual(lam)
+    ratio = (np.sqrt(5) - 1) / 2
+    for _ in range(2):
+        for r in range(len(required)):
+            if required[r] <= 0:
+                continue
+            current = lam[r]
+
+            def along(x):
+                lam[r] = x
+                return dual(lam)
+
+            low, high = 0.0, 1.0 / required[r]
+            high_value = along(high)
+            for _ in range(40):
+                double_value = along(2 * high)
+                if double_value >= high_value:
+                    break
+                low, high, high_value = high / 2, 2 * high, double_value
+            high *= 2
+
+            left, right = high - ratio * (high - low), low + ratio * (high - low)
+            left_value, right_value = along(left), along(right)
+            for _ in range(12):
+                if left_value <= right_value:
+                    high, right, right_value = right, left, left_value
+                    left = high - ratio * (high - low)
+                    left_value = along(left)
+                else:
+                    low, left, left_value = left, right, right_value
+                    right = low + ratio * (high - low)
+                    right_value = along(right)
+            x, value = (left, left_value) if left_value <= right_value else (right, right_value)
+            if value < best:
+                lam[r], best = x, value
+            else:
+                lam[r] = current
+    return lam
+
+
+def solve_branch_and_bound(items_df, bonuses_df, weights, base_stats, pa, pm, min_stats, time_limit=None):
+    """Exact slot by slot branch and bound over the same problem as `build_problem`.
+
+    Returns the selected item ids, the selected set bonus keys and the
+    objective, or `None` when no equipment meets the constraints. Raises
+    `SearchTimeout` when `time_limit` seconds go by before the search ends;
+    with `time_limit='auto'`, the search may last as long as the set-up.
+    """
+    start = time.perf_counter()
+    deadline = None if time_limit in (None, 'auto') else start + time_limit
+    items_df = items_df.reset_index(drop=True)
+    columns = items_df.columns
+    ids = items_df['id'].tolist()
+    n_items = len(ids)
+
+    # Item scores and the "at least" rows (PA, PM, then the other minimum stats)
+    scores = np.zeros(n_items)
+    for char, weight in weights.items():
+        if char in columns:
+            scores += items_df[char].to_numpy(dtype=float) * weight
+
+    row_minimums = {'characteristic_1': pa, 'characteristic_23': pm}
+    for char, minimum in min_stats.items():
+        if char not in ('characteristic_1', 'characteristic_23') and char in columns:
+            row_minimums[char] = minimum
+    row_chars = list(row_minimums)
+    n_rows = len(row_chars)
+    required = np.array([row_minimums[char] - base_stats.get(char, 0) for char in row_chars], dtype=float)
+    item_rows = np.column_stack([
+        items_df[char].to_numpy(dtype=float) if char in columns else np.zeros(n_items)
+        for char in row_chars
+    ])
+
+    # Conditions enforced by the ILP, per item
+    item_conditions = []
+    for condition_str in (items_df['condition'] if 'condition' in columns else [None] * n_items):
+        parsed = (parse_condition(cond, columns) for cond in extract_conditions(condition_str))
+        item_conditions.append(sorted({cond for cond in parsed if cond is not None}))
+    condition_chars = sorted({char for conds in item_conditions for char, _, _ in conds if char != 'Pk'})
+    has_pk = any(char == 'Pk' for conds in item_conditions for char, _, _ in conds)
+    item_condition_stats = np.column_stack([
+        items_df[char].to_numpy(dtype=float) for char in condition_chars
+    ]) if condition_chars else np.zeros((n_items, 0))
+    base_condition_stats = np.array([base_stats.get(char, 0) for char in condition_chars], dtype=float)
+
+    # Set bonus tiers: score, rows and condition stats of each increment
+    keys = set_bonus_keys(items_df, bonuses_df)
+    tier_scores = dict.fromkeys(keys, 0.0)
+    for char, weight in weights.items():
+        _, bonus_coefs = stat_coefficients(items_df, bonuses_df, keys, char)
+        for key, value in bonus_coefs.items():
+            tier_scores[key] += value * weight
+    tier_rows = {key: np.zeros(n_rows) for key in keys}
+    for r, char in enumerate(row_chars):
+        _, bonus_coefs = stat_coefficients(items_df, bonuses_df, keys, char)
+        for key, value in bonus_coefs.items():
+            tier_rows[key][r] = value
+    tier_condition_stats = {key: np.zeros(len(condition_chars)) for key in keys}
+    for c, char in enumerate(condition_chars):
+        _, bonus_coefs = stat_coefficients(items_df, bonuses_df, keys, char)
+        for key, value in bonus_coefs.items():
+            tier_condition_stats[key][c] = value
+
+    # Every objective is a multiple of this step: a bound short of the best
+    # selection found plus one step cannot lead to a better one
+    score_step = max(_score_step(np.unique(np.concatenate([scores, list(tier_scores.values())]))), 2 * EPSILON)
+
+    set_tiers = defaultdict(list)
+    for key in keys:
+        set_tiers[key[0]].append(key)
+    for tiers in set_tiers.values():
+        tiers.sort(key=lambda key: key[1])
+    item_sets = [pano if pano in set_tiers else None for pano in items_df['pano'].tolist()]
+
+    # Tier increments of every set side by side, padded up to the most items
+    # a set can be worn with
+    set_ids = list(set_tiers)
+    set_sizes = defaultdict(int)
+    for set_id in item_sets:
+        if set_id is not None:
+            set_sizes[set_id] += 1
+    max_set_size = max([len(tiers) + 1 for tiers in set_tiers.values()] + list(set_sizes.values()) + [1])
+    increment_scores = np.zeros((len(set_ids), max_set_size - 1))
+    increment_rows = np.zeros((len(set_ids), max_set_size - 1, n_rows))
+    for s, set_id in enumerate(set_ids):
+        for t, key in enumerate(set_tiers[set_id]):
+            increment_scores[s, t] = tier_scores[key]
+            increment_rows[s, t] = tier_rows[key]
+
+    # Optimistic "at least" rows: a started set can never add more than its
+    # positive tiers up to the number of items it can still reach, and an
+    # item of a set not started yet never brings more than the best average
+    # share of its set over the items it can still get (see `depth_rows`)
+    row_reachable = np.stack([_reachable_bonus(increment_rows[:, :, r]) for r in range(n_rows)], axis=2)
+    row_shares = np.stack([_share_tables(row_reachable[:, :, r])[:, 0] for r in range(n_rows)], axis=2)
+    set_row_reachable = dict(zip(set_ids, row_reachable))
+
+    # Slot groups, as in Step 4 of `build_problem`
+    group_members = defaultdict(list)
+    group_limits = {}
+    for i, item_type in enumerate(items_df['type'].tolist()):
+        if item_type in GROUPED_TYPES:
+            group = 'weapon'
+            group_limits[group] = 1
+        elif item_type in DOFUS_TROPHY_TYPES:
+            group = 'dofus_trophy'
+            group_limits[group] = DOFUS_TROPHY_LIMIT
+        else:
+            group = item_type
+            group_limits[group] = type_limit(item_type)
+        group_members[group].append(i)
+
+    # Drop the items that `limit` other items of their group beat on score and
+    # on every "at least" row, even after paying for the set tier they would
+    # take with them: swapping them out never makes a selection worse
+    set_loss = {set_id: max(0.0, max(tier_scores[key] for key in tiers)) for set_id, tiers in set_tiers.items()}
+    set_row_loss = {
+        set_id: np.maximum(0.0, np.max([tier_rows[key] for key in tiers], axis=0))
+        for set_id, tiers in set_tiers.items()
+    }
+    set_touches_conditions = {
+        set_id: has_pk or any(np.any(tier_condition_stats[key]) for key in tiers)
+        for set_id, tiers in set_tiers.items()
+    }
+
+    has_conditions = np.array([bool(conds) for conds in item_conditions], dtype=bool)
+
+    def dominators(kept, i):
+        """How many of the `kept` items beat item i."""
+        set_id = item_sets[i]
+        loss = set_loss[set_id] if set_id is not None else 0.0
+        row_loss = set_row_loss[set_id] if set_id is not None else 0.0
+        beats = (
+            ~has_conditions[kept]
+            & (scores[kept] >= scores[i] + loss - EPSILON)
+            & np.all(item_rows[kept] >= item_rows[i] + row_loss - EPSILON, axis=1)
+            & np.all(item_condition_stats[kept] == item_condition_stats[i], axis=1)
+        )
+        return np.count_nonzero(beats)
+
+    groups = []
+    for group, members in group_members.items():
+        limit = group_limits[group]
+        kept = []
+        for i in sorted(members, key=lambda i: (-scores[i], ids[i])):
+            set_id = item_sets[i]
+            if (set_id is None or not set_touches_conditions[set_id]) and dominators(np.array(kept, dtype=int), i) >= limit:
+                continue
+            kept.append(i)
+        if kept:
+            groups.append((np.array(kept, dtype=int), min(limit, len(kept))))
+
+    # Single slots first, so that the sets spread over them are settled
+    # before the ring and Dofus/Trophy picks
+    groups.sort(key=lambda group: group[1])
+    n_groups = len(groups)
+    group_indices = [indices for indices, _ in groups]
+    group_limits = [limit for _, limit in groups]
+
+    # For each depth: the candidates of the groups left, how many more items
+    # each set can get from them, and where each set's candidates sit in
+    # each of these groups (also flattened, with the set index and room of
+    # every such candidate, to add the set shares in one go)
+    set_index = {set_id: s for s, set_id in enumerate(set_ids)}
+    depth_candidates = []
+    depth_starts = []
+    depth_room = []
+    depth_set_groups = []
+    depth_set_positions = []
+    depth_members = []
+    for g in range(n_groups + 1):
+        candidates = np.concatenate(group_indices[g:]) if g < n_groups else np.zeros(0, dtype=int)
+        depth_candidates.append(candidates)
+        depth_starts.append(np.cumsum([0] + [len(indices) for indices in group_indices[g:]]))
+        room = defaultdict(int)
+        set_groups = defaultdict(list)
+        for h, (indices, limit) in enumerate(zip(group_indices[g:], group_limits[g:])):
+            positions = defaultdict(list)
+            for position, i in enumerate(indices, start=depth_starts[g][h]):
+                if item_sets[i] is not None:
+                    positions[item_sets[i]].append(position)
+            for set_id, p in positions.items():
+                room[set_id] += min(limit, len(p))
+                set_groups[set_id].append((h, np.array(p, dtype=int)))
+        depth_room.append(room)
+        depth_set_groups.append(set_groups)
+        depth_set_positions.append({
+            set_id: np.concatenate([p for _, p in groups_of_set]) for set_id, groups_of_set in set_groups.items()
+        })
+        members = [(q, set_index[set_id], room[set_id]) for set_id, p in depth_set_positions[g].items() for q in p]
+        depth_members.append(tuple(np.array(column, dtype=int) for column in zip(*members)) if members else (np.zeros(0, dtype=int),) * 3)
+
+    # Optimistic rows of the candidates of each depth, and the best
+    # contribution of q picks of a group, and of the groups g:, to every row,
+    # for the feasibility checks
+    depth_rows = []
+    group_row_bounds = []
+    tail_rows = []
+    for g in range(n_groups + 1):
+        rows = item_rows[depth_candidates[g]]
+        positions, member_sets, member_rooms = depth_members[g]
+        rows[positions] += row_shares[member_sets, member_rooms]
+        depth_rows.append(rows)
+        starts = depth_starts[g]
+        best_picks = [
+            np.concatenate([np.zeros((1, n_rows)), np.cumsum(np.sort(np.maximum(rows[starts[h]:starts[h + 1]], 0), axis=0)[::-1], axis=0)])[:limit + 1]
+            for h, limit in enumerate(group_limits[g:])
+        ]
+        if g < n_groups:
+            group_row_bounds.append(best_picks[0])
+        tail_rows.append(sum((picks[-1] for picks in best_picks), np.zeros(n_rows)))
+
+    # How far each condition stat can still go up (sign 1) and down (sign -1)
+    # from group g on, with the same optimistic set shares as the rows, to
+    # drop a path as soon as the conditions of its items are out of reach
+    n_conditions = len(condition_chars)
+    condition_reachable = {}
+    condition_tails = {}
+    if n_conditions:
+        increment_conditions = np.zeros((len(set_ids), max_set_size - 1, n_conditions))
+        for s, set_id in enumerate(set_ids):
+            for t, key in enumerate(set_tiers[set_id]):
+                increment_conditions[s, t] = tier_condition_stats[key]
+        for sign in (1, -1):
+            reachable = np.stack([_reachable_bonus(sign * increment_conditions[:, :, c]) for c in range(n_conditions)], axis=2)
+            shares = np.stack([_first_shares(reachable[:, :, c]) for c in range(n_conditions)], axis=2)
+            condition_reachable[sign] = dict(zip(set_ids, reachable))
+            condition_tails[sign] = []
+            for g in range(n_groups + 1):
+                values = np.maximum(sign * item_condition_stats[depth_candidates[g]], 0)
+                positions, member_sets, member_rooms = depth_members[g]
+                values[positions] += shares[member_sets, member_rooms]
+                starts = depth_starts[g]
+                condition_tails[sign].append(sum(
+                    (np.sort(values[starts[h]:starts[h + 1]], axis=0)[::-1][:limit].sum(axis=0) for h, limit in enumerate(group_limits[g:])),
+                    np.zeros(n_conditions),
+                ))
+
+    # Lagrangian values: multipliers price the "at least" rows into the items
+    # and the set tiers. The plain bound (multipliers at 0) does not credit
+    # the rows' slack, and the Lagrangian ones are fitted per depth and per
+    # what the rows still need, the root multipliers being too coarse once
+    # part of the rows is met
+    need_steps = np.maximum(1.0, np.ceil(required / 8))
+
+    def make_bound(multipliers):
+        reachable = _reachable_bonus(increment_scores + increment_rows @ multipliers)
+        shares = _share_tables(reachable)
+        return {
+            'multipliers': multipliers,
+            'item_values': scores + item_rows @ multipliers,
+            'set_reachable': dict(zip(set_ids, reachable)),
+            'set_shares': dict(zip(set_ids, shares)),
+            'first_shares': shares[:, 0],
+            'offset': -float(multipliers @ required),
+            'depth_values': {},
+        }
+
+    def depth_values(bound, g):
+        """Values of the candidates of the groups g: while their sets are not started."""
+        if g not in bound['depth_values']:
+            values = bound['item_values'][depth_candidates[g]]
+            positions, member_sets, member_rooms = depth_members[g]
+            values[positions] += bound['first_shares'][member_sets, member_rooms]
+            bound['depth_values'][g] = values
+        return bound['depth_values'][g]
+
+    plain_bound = make_bound(np.zeros(n_rows))
+    lagrangian_bounds = {}
+
+    def need_of(rows):
+        # Rounded down: multipliers fitted to a need the node does not have
+        # can grow without limit when that need is out of reach
+        return np.maximum(0.0, np.floor((required - rows) / need_steps + EPSILON))
+
+    def lagrangian_bound(g, need):
+        key = (g, tuple(need))
+        if key not in lagrangian_bounds:
+            candidates = depth_candidates[g]
+            positions, member_sets, member_rooms = depth_members[g]
+            needed = need * need_steps
+
+            def dual(multipliers):
+                # Same as entry_values with no set started, without building the bound
+                shares = _first_shares(_reachable_bonus(increment_scores + increment_rows @ multipliers))
+                values = scores[candidates] + item_rows[candidates] @ multipliers
+                values[positions] += shares[member_sets, member_rooms]
+                return _groups_top_sum(values, depth_starts[g], group_limits[g:]) - float(multipliers @ needed)
+
+            lagrangian_bounds[key] = make_bound(_fit_multipliers(dual, needed))
+        return lagrangian_bounds[key]
+
+    def check_deadline():
+        if deadline is not None and time.perf_counter() > deadline:
+            raise SearchTimeout(f"Recherche interrompue après {time.perf_counter() - start:.1f} s")
+
+    def best_bonuses(chosen):
+        """Picks the set tiers of a full selection, or returns None if it is infeasible."""
+        counts = defaultdict(int)
+        for i in chosen:
+            if item_sets[i] is not None:
+                counts[item_sets[i]] += 1
+        tiers = [key for set_id, count in counts.items() for key in set_tiers[set_id] if key[1] <= count]
+
+        conditions = sorted({cond for i in chosen for cond in item_conditions[i]})
+        stat_conditions = [(condition_chars.index(char), op, value) for char, op, value in conditions if char != 'Pk']
+        forbidden_from = None
+        needed_from = []
+        for char, op, value in conditions:
+            if char != 'Pk':
+                continue
+            if op in ('<', '<=', '='):
+                threshold = value if op == '<' else value + 1
+                forbidden_from = threshold if forbidden_from is None else min(forbidden_from, threshold)
+            if op in ('>', '>=', '='):
+                needed_from.append(value + 1 if op == '>' else value)
+
+        rows = item_rows[chosen].sum(axis=0)
+        condition_stats = item_condition_stats[chosen].sum(axis=0) + base_condition_stats
+
+        def moves_towards(key, sign):
+            # sign 1: the tier can only help the stat conditions, -1: only hurt them
+            for c, op, _ in stat_conditions:
+                value = sign * tier_condition_stats[key][c]
+                if op in ('>', '>=') and value < 0 or op in ('<', '<=') and value > 0 or op == '=' and value:
+                    return False
+            return True
+
+        # Tiers that can only help are always taken, the ones that can only
+        # hurt never are, and the few left are tried both ways
+        always, ambiguous = [], []
+        for key in tiers:
+            if forbidden_from is not None and key[1] >= forbidden_from:
+                continue
+            needed = any(key[1] >= threshold for threshold in needed_from)
+            if tier_scores[key] >= 0 and np.all(tier_rows[key] >= 0) and moves_towards(key, 1):
+                if tier_scores[key] > 0 or needed or np.any(tier_rows[key] > 0):
+                    always.append(key)
+            elif not (tier_scores[key] <= 0 and np.all(tier_rows[key] <= 0) and moves_towards(key, -1) and not needed):
+                ambiguous.append(key)
+
+        # What the ambiguous tiers from the j-th on can still add at most to
+        # the score, the rows and the condition stats (and remove at most
+        # from the latter)
+        n_ambiguous = len(ambiguous)
+        score_gains = np.zeros(n_ambiguous + 1)
+        row_gains = np.zeros((n_ambiguous + 1, n_rows))
+        condition_gains = np.zeros((n_ambiguous + 1, n_conditions))
+        condition_losses = np.zeros((n_ambiguous + 1, n_conditions))
+        for j in range(n_ambiguous - 1, -1, -1):
+            key = ambiguous[j]
+            score_gains[j] = score_gains[j + 1] + max(tier_scores[key], 0)
+            row_gains[j] = row_gains[j + 1] + np.maximum(tier_rows[key], 0)
+            condition_gains[j] = condition_gains[j + 1] + np.maximum(tier_condition_stats[key], 0)
+            condition_losses[j] = condition_losses[j + 1] + np.minimum(tier_condition_stats[key], 0)
+
+        # Depth first over the ambiguous tiers, each taken or not, dropping a
+        # branch as soon as the tiers left cannot meet the rows and the
+        # conditions or beat the best choice found
+        best = None
+        active = list(always)
+
+        def search(j, value, rows, totals):
+            nonlocal best
+            check_deadline()
+            if best is not None and value + score_gains[j] <= best[0] + EPSILON:
+                return
+            if np.any(rows + row_gains[j] < required - EPSILON):
+                return
+            if not all(
+                _can_meet(totals[c] + condition_gains[j][c], totals[c] + condition_losses[j][c], op, threshold)
+                for c, op, threshold in stat_conditions
+            ):
+                return
+            if j == n_ambiguous:
+                if all(any(key[1] >= threshold for key in active) for threshold in needed_from):
+                    best = (value, list(active))
+                return
+            key = ambiguous[j]
+            for take in ((True, False) if tier_scores[key] >= 0 else (False, True)):
+                if take:
+                    active.append(key)
+                    search(j + 1, value + tier_scores[key], rows + tier_rows[key], totals + tier_condition_stats[key])
+                    active.pop()
+                else:
+                    search(j + 1, value, rows, totals)
+
+        search(
+            0,
+            sum(tier_scores[key] for key in always),
+            rows + sum((tier_rows[key] for key in always), np.zeros(n_rows)),
+            condition_stats + sum((tier_condition_stats[key] for key in always), np.zeros(n_conditions)),
+        )
+        return best
+
+    best = {'value': -np.inf, 'cutoff': -np.inf, 'items': None, 'bonuses': None}
+    chosen = []
+    set_counts = defaultdict(int)
+
+    # Without conditions, two paths reaching a group with the same counts in
+    # the sets still open and the same rows have the same completions: the
+    # one with the lower score can be dropped. A closed set whose tiers all
+    # only help or only hurt always brings the same, so it is folded into
+    # the score and the rows; rows that never drop are compared once met
+    dominance = None if any(item_conditions) else {}
+    rows_never_drop = bool(np.all(item_rows >= 0)) and bool(np.all(increment_rows >= 0))
+    closed_sets = {}
+
+    def closed_set(set_id, count):
+        """Score and rows a closed set brings, or None if its tiers depend on the rest."""
+        if (set_id, count) not in closed_sets:
+            score, rows = 0.0, np.zeros(n_rows)
+            for key in set_tiers[set_id]:
+                if key[1] > count:
+                    continue
+                if tier_scores[key] >= 0 and np.all(tier_rows[key] >= 0):
+                    score += tier_scores[key]
+                    rows = rows + tier_rows[key]
+                elif not (tier_scores[key] <= 0 and np.all(tier_rows[key] <= 0)):
+                    score = None
+                    break
+            closed_sets[set_id, count] = None if score is None else (score, rows)
+        return closed_sets[set_id, count]
+
+    def dominated(g, score, rows):
+        open_sets = []
+        for set_id, count in set_counts.items():
+            if not count:
+                continue
+            closed = None if depth_room[g].get(set_id) else closed_set(set_id, count)
+            if closed is None:
+                open_sets.append((set_id, count))
+            else:
+                score += closed[0]
+                rows = rows + closed[1]
+        key = (g, tuple(sorted(open_sets)), tuple(np.minimum(rows, required) if rows_never_drop else rows))
+        if dominance.get(key, -np.inf) >= score - EPSILON:
+            return True
+        dominance[key] = score
+        return False
+
+    def started_set_rows(g):
+        # What the sets already started can still add to the rows from group g on
+        total = np.zeros(n_rows)
+        for set_id, count in set_counts.items():
+            if count:
+                total += reachable_rows(set_id, count, g)
+        return total
+
+    def reachable_rows(set_id, count, g):
+        reachable = set_row_reachable[set_id]
+        return reachable[min(len(reachable) - 1, count + depth_room[g][set_id])]
+
+    def conditions_within_reach(g):
+        """Whether the stat conditions of the items picked so far can still hold once the groups g: are filled."""
+        conditions = {cond for i in chosen for cond in item_conditions[i] if cond[0] != 'Pk'}
+        if not conditions:
+            return True
+        totals = item_condition_stats[chosen].sum(axis=0) + base_condition_stats
+        highest = totals + condition_tails[1][g]
+        lowest = totals - condition_tails[-1][g]
+        for set_id, count in set_counts.items():
+            if count:
+                room = min(count + depth_room[g][set_id], max_set_size)
+                highest = highest + condition_reachable[1][set_id][room]
+                lowest = lowest - condition_reachable[-1][set_id][room]
+        return all(
+            _can_meet(highest[c], lowest[c], op, value)
+            for c, op, value in ((condition_chars.index(char), op, value) for char, op, value in conditions)
+        )
+
+    def rows_within_reach(g, rows):
+        """Whether the groups g: can still meet the rows, one by one and all at once.
+
+        Scaling each row by what it still misses also drops the paths where
+        the slots left could meet any one of them but not all together (e.g.
+        PM and % Critique that would need the same Dofus slots).
+        """
+        missing = required - rows - started_set_rows(g)
+        if np.any(missing > tail_rows[g] + EPSILON):
+            return False
+        short = missing > EPSILON
+        if np.count_nonzero(short) < 2:
+            return True
+        scale = np.where(short, 1 / np.maximum(missing, EPSILON), 0.0)
+        reach = _groups_top_sum(depth_rows[g] @ scale, depth_starts[g], group_limits[g:])
+        return reach >= np.count_nonzero(short) - EPSILON
+
+    def entry_values(bound, g, score, rows):
+        """Bound of the groups g: for the current path, and the values of their candidates."""
+        values = depth_values(bound, g).copy()
+        path_value = score + float(rows @ bound['multipliers']) + bound['offset']
+        room = depth_room[g]
+        for set_id, count in set_counts.items():
+            if not count:
+                continue
+            path_value += bound['set_reachable'][set_id][count]
+            positions = depth_set_positions[g].get(set_id)
+            if positions is not None:
+                shares = bound['set_shares'][set_id]
+                values[positions] += shares[count][room[set_id]] - shares[0][room[set_id]]
+
+        return path_value + _groups_top_sum(values, depth_starts[g], group_limits[g:]), values
+
+    def enter_group(g, score, rows):
+        """Branches on group g, `score` and `rows` being what the items picked so far bring."""
+        if g == n_groups:
+            bonuses = best_bonuses(chosen)
+            if bonuses is not None:
+                total = float(scores[chosen].sum()) + bonuses[0]
+                if total > best['value'] + EPSILON:
+                    best.update(value=total, cutoff=total + score_step - EPSILON, items=list(chosen), bonuses=bonuses[1])
+            return
+
+        check_deadline()
+        if dominance is not None and dominated(g, score, rows):
+            return
+        if not rows_within_reach(g, rows):
+            return
+        if n_conditions and not conditions_within_reach(g):
+            return
+        bound_plain, values_plain = entry_values(plain_bound, g, score, rows)
+        if bound_plain < best['cutoff']:
+            return
+        lagrangian = lagrangian_bound(g, need_of(rows))
+        bound_value, values = entry_values(lagrangian, g, score, rows)
+        if bound_value < best['cutoff']:
+            return
+        n_candidates = depth_starts[g][1]
+        candidate_plain = values_plain[:n_candidates]
+        candidate_values = values[:n_candidates]
+        rest_plain = bound_plain - _top_sum(candidate_plain, group_limits[g])
+        rest_value = bound_value - _top_sum(candidate_values, group_limits[g])
+
+        # Candidates by decreasing Lagrangian value, so that its bound can
+        # stop the loop; the plain bound only skips candidates
+        indices = group_indices[g]
+        order = np.argsort(-candidate_values, kind='stable')
+        sorted_values = candidate_values[order]
+        positive_prefix = np.concatenate([[0.0], np.cumsum(np.maximum(sorted_values, 0))]).tolist()
+        sorted_values = sorted_values.tolist()
+        sorted_plain = candidate_plain[order].tolist()
+        plain_top = np.concatenate([[0.0], np.cumsum(np.sort(np.maximum(candidate_plain, 0))[::-1])]).tolist()
+
+        def pick(start, left, picked_value, picked_plain, score, rows, rest_rows):
+            next_bounds = {}
+
+            def next_bound(bound, i):
+                """Bound of the next group's node once item i is picked last here.
+
+                The groups left stay as they are for this path, but for what
+                one more item of i's set moves in them.
+                """
+                if id(bound) not in next_bounds:
+                    next_bounds[id(bound)] = (*entry_values(bound, g + 1, score, rows), {})
+                next_value, next_values, gains = next_bounds[id(bound)]
+                set_id = item_sets[i]
+                if set_id is not None and set_id not in gains:
+                    count = set_counts[set_id]
+                    reachable = bound['set_reachable'][set_id]
+                    gain = reachable[count + 1] - reachable[count]
+                    shares = bound['set_shares'][set_id]
+                    room = depth_room[g + 1].get(set_id, 0)
+                    step = shares[count + 1][room] - shares[count][room]
+                    starts = depth_starts[g + 1]
+                    for h, positions in depth_set_groups[g + 1].get(set_id, ()):
+                        group_values = next_values[starts[h]:starts[h + 1]]
+                        moved = group_values.copy()
+                        moved[positions - starts[h]] += step
+                        limit = group_limits[g + 1 + h]
+                        gain += _top_sum(moved, limit) - _top_sum(group_values, limit)
+                    gains[set_id] = gain
+                return next_value + float(scores[i] + item_rows[i] @ bound['multipliers']) + (gains[set_id] if set_id is not None else 0.0)
+
+            if left:
+                tried = 0
+                for p in range(start, n_candidates):
+                    bound = picked_value + sorted_values[p] + positive_prefix[min(n_candidates, p + left)] - positive_prefix[p + 1]
+                    if rest_value + bound < best['cutoff']:
+                        break
+                    if rest_plain + picked_plain + sorted_plain[p] + plain_top[min(n_candidates, left - 1)] < best['cutoff']:
+                        continue
+                    i = indices[order[p]]
+                    set_id = item_sets[i]
+                    picked_rest_rows = rest_rows
+                    if set_id is not None and not set_counts[set_id]:
+                        picked_rest_rows = rest_rows + reachable_rows(set_id, 0, g)
+                    picked_rows = rows + item_rows[i]
+                    if np.any(picked_rows + group_row_bounds[g][left - 1] + picked_rest_rows < required - EPSILON):
+                        continue
+                    if left == 1 and g + 1 < n_groups and (
+                        next_bound(lagrangian, i) < best['cutoff']
+                        or next_bound(plain_bound, i) < best['cutoff']
+                    ):
+                        continue
+                    chosen.append(i)
+                    if set_id is not None:
+                        set_counts[set_id] += 1
+                    pick(
+                        p + 1, left - 1, picked_value + sorted_values[p], picked_plain + sorted_plain[p],
+                        score + scores[i], picked_rows, picked_rest_rows,
+                    )
+                    if set_id is not None:
+                        set_counts[set_id] -= 1
+                    chosen.pop()
+                    tried += 1
+                    if tried == width[0]:
+                        break
+
+            # Leave the remaining picks of this group empty
+            if rest_value + picked_value < best['cutoff'] or rest_plain + picked_plain < best['cutoff']:
+                return
+            if np.any(rows + rest_rows < required - EPSILON):
+                return
+            enter_group(g + 1, score, rows)
+
+        pick(0, group_limits[g], 0.0, 0.0, score, rows, tail_rows[g + 1] + started_set_rows(g))
+
+    # The set-up above grows with the items and set tiers like a PuLP solve,
+    # which takes four to six times as long: giving the search as long as the
+    # set-up keeps a fallback to PuLP within about half a PuLP solve more
+    if time_limit == 'auto':
+        deadline = 2 * time.perf_counter() - start
+
+    # Narrow passes first, going down only the first few candidates of every
+    # pick, find a good selection early for the full search to prune with.
+    # They cut paths short, so their dominance memo is dropped afterwards
+    width = [None]
+    for narrow in (1, 3):
+        width[0] = narrow
+        enter_group(0, 0.0, np.zeros(n_rows))
+        if dominance is not None:
+            dominance.clear()
+        if best['items'] is not None:
+            break
+    width[0] = None
+    enter_group(0, 0.0, np.zeros(n_rows))
+
+    if best['items'] is None:
+        return None
+    selected_items = [ids[i] for i in sorted(best['items'])]
+    active = set(best['bonuses'])
+    selected_bonuses = [key for key in keys if key in active]
+    return selected_items, selected_bonuses, best['value']
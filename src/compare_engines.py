@@ -0,0 +1,139 @@
+import argparse
+import shlex
+import sys
+import time
+
+from pulp import PULP_CBC_CMD, LpStatus, value
+
+from bnb import SearchTimeout, solve_branch_and_bound
+from optimizer import (
+    build_arg_parser,
+    build_problem,
+    characteristic_columns,
+    default_base_stats,
+    filter_items,
+    load_data,
+    parse_base_stats,
+    parse_weights,
+)
+
+
+# Fixed queries, as optimizer.py arguments, with conditions to inject on
+# some items: the data has no condition the solvers enforce yet, so these
+# go on items of the unconstrained optimum (1265) to rule it out
+QUERIES = [
+    (
+        "Exemple du README",
+        "--max-level 100 --pa 10 --pm 5 --weights characteristic_10:1.0 characteristic_11:0.5 "
+        "--base-stats characteristic_10:200 characteristic_13:100 --min-stats characteristic_10:100 characteristic_13:300",
+        {},
+    ),
+    (
+        "Stats minimales",
+        "--max-level 200 --pa 6 --pm 4 --weights characteristic_19:3 --min-stats characteristic_10:100",
+        {},
+    ),
+    (
+        "Poids négatifs",
+        "--max-level 100 --pa 10 --pm 4 --weights characteristic_19:-0.5 characteristic_16:-1 --min-stats characteristic_16:50",
+        {},
+    ),
+    (
+        "Poids négatif, sans Dofus",
+        "--max-level 150 --pa 9 --pm 3 --no-dofus --weights characteristic_11:-1 characteristic_13:2 "
+        "--min-stats characteristic_11:20 characteristic_13:300",
+        {},
+    ),
+    (
+        "Sans Dofus",
+        "--max-level 150 --pa 10 --pm 3 --no-dofus --weights characteristic_11:0.5",
+        {},
+    ),
+    (
+        "Conditions (Agilité)",
+        "--max-level 100 --pa 10 --pm 5 --weights characteristic_10:1.0 characteristic_11:0.5",
+        {737: "CA>400", 7887: "CA>400", 7888: "CA>400"},
+    ),
+    (
+        "Conditions (Force, Pk)",
+        "--max-level 100 --pa 10 --pm 5 --weights characteristic_10:1.0 characteristic_11:0.5",
+        {737: "CS>600&Pk<3", 7887: "CS>600&Pk<3", 7888: "CS>600&Pk<3"},
+    ),
+    (
+        "Infaisable",
+        "--max-level 20 --pa 8 --pm 5 --weights characteristic_18:2",
+        {},
+    ),
+]
+
+
+def solve_pulp(items_df, bonuses_df, weights, base_stats, pa, pm, min_stats):
+    """Returns the objective found by PuLP, or None when the problem is infeasible."""
+    problem, _, _, _ = build_problem(items_df, bonuses_df, weights, base_stats, pa, pm, min_stats)
+    problem.solve(PULP_CBC_CMD(msg=False))
+    if LpStatus[problem.status] != 'Optimal':
+        return None
+    return value(problem.objective)
+
+
+def describe_result(result):
+    if result is None:
+        return "infaisable"
+    if isinstance(result, SearchTimeout):
+        return "interrompu"
+    return f"{result:g}"
+
+
+def run_query(items_df, bonuses_df, command, conditions, time_limit):
+    """Solves one query with both engines and returns (pulp result, bnb result, pulp time, bnb time)."""
+    args = build_arg_parser().parse_args(shlex.split(command))
+    items_df = items_df.copy()
+    for item_id, condition in conditions.items():
+        items_df.loc[items_df['id'] == item_id, 'condition'] = condition
+    items_df = filter_items(items_df, args.min_level, args.max_level, args.no_dofus)
+    weights = parse_weights(args.weights, characteristic_columns(items_df))
+    base_stats = default_base_stats(args.base_stats, args.max_level)
+    min_stats = parse_base_stats(args.min_stats)
+
+    start = time.perf_counter()
+    expected = solve_pulp(items_df, bonuses_df, weights, base_stats, args.pa, args.pm, min_stats)
+    pulp_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        solution = solve_branch_and_bound(
+            items_df, bonuses_df, weights, base_stats, args.pa, args.pm, min_stats, time_limit
+        )
+        found = None if solution is None else solution[2]
+    except SearchTimeout as e:
+        found = e
+    bnb_time = time.perf_counter() - start
+    return expected, found, pulp_time, bnb_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks that the pulp and bnb engines find the same objective')
+    parser.add_argument('--time-limit', type=float, default=120, help='Seconds given to bnb for each query')
+    args = parser.parse_args()
+
+    items_df, bonuses_df = load_data()
+    failures = 0
+    for name, command, conditions in QUERIES:
+        expected, found, pulp_time, bnb_time = run_query(items_df, bonuses_df, command, conditions, args.time_limit)
+        if isinstance(found, SearchTimeout):
+            status = "ÉCHEC"
+        elif expected is None or found is None:
+            status = "OK" if expected is None and found is None else "ÉCHEC"
+        else:
+            status = "OK" if abs(expected - found) <= 1e-6 else "ÉCHEC"
+        failures += status != "OK"
+        print(f"{status:<5} {name} : pulp {describe_result(expected)} ({pulp_time:.2f} s), bnb {describe_result(found)} ({bnb_time:.2f} s)")
+
+    if failures:
+        print(f"{failures} requête(s) sur {len(QUERIES)} en échec.")
+        sys.exit(1)
+    print(f"Les {len(QUERIES)} requêtes donnent le même objectif avec les deux moteurs.")
+
+
+if __name__ == '__main__':
+    main()
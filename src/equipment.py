@@ -0,0 +1,89 @@
+import re
+
+
+# Weapons share a single slot, Dofus and Trophies share six slots between them
+GROUPED_TYPES = [3, 7, 4, 2, 5, 6, 19, 22, 8]
+DOFUS_TROPHY_TYPES = [151, 23]
+DOFUS_TROPHY_LIMIT = 6
+
+# Condition codes (e.g. `CS>100`) and the characteristic they refer to
+CONDITION_CODES = dict(zip(
+    ['W', 'S', 'C', 'A', 'I', 'P', 'M', 'V'],
+    ['characteristic_12', 'characteristic_10', 'characteristic_13', 'characteristic_14', 'characteristic_15', 'characteristic_1', 'characteristic_23', 'characteristic_11']
+))
+CONDITION_CHARS = list(CONDITION_CODES.values())
+
+C_CONDITION_REGEX = re.compile(r'\b(C[A-Za-z0-9]*)\s*(<=|>=|=|<|>)\s*([0-9]+)\b')
+PK_CONDITION_REGEX = re.compile(r'\b(Pk)\s*(<=|>=|=|<|>)\s*([0-9]+)\b')
+STAT_COND_REGEX = re.compile(r'^C([A-Za-z0-9]+)(<=|>=|=|<|>)(\d+)$')
+PK_COND_REGEX = re.compile(r'^(Pk)(<=|>=|=|<|>)(\d+)$')
+
+
+def type_limit(item_type):
+    """Number of items of `item_type` that can be worn at once (weapons are capped as a group)."""
+    if item_type == 9:
+        return 2
+    if item_type in DOFUS_TROPHY_TYPES:
+        return DOFUS_TROPHY_LIMIT
+    return 1
+
+
+def extract_conditions(condition_str):
+    if not isinstance(condition_str, str):
+        return []
+    normalized = condition_str.replace("|", "&")
+    c_matches = C_CONDITION_REGEX.findall(normalized)
+    pk_matches = PK_CONDITION_REGEX.findall(normalized)
+    return [f"{var}{op}{val}" for var, op, val in c_matches + pk_matches]
+
+
+def parse_condition(cond, columns):
+    """Returns (characteristic or 'Pk', operator, value) for a condition the ILP enforces.
+
+    Conditions on unknown codes or on characteristics missing from `columns`
+    are ignored by the ILP, and `None` is returned for them.
+    """
+    stat_match = STAT_COND_REGEX.match(cond)
+    if stat_match:
+        code, op, value_str = stat_match.groups()
+        char = CONDITION_CODES.get(code)
+        if char is None or char not in columns:
+            return None
+        return char, op, int(value_str)
+    pk_match = PK_COND_REGEX.match(cond)
+    if pk_match:
+        _, op, value_str = pk_match.groups()
+        return 'Pk', op, int(value_str)
+    return None
+
+
+def set_bonus_keys(items_df, bonuses_df):
+    """Lists the (set id, number of items) bonus tiers reachable with the filtered items."""
+    keys = []
+    valid_pano_ids = set(bonuses_df['id'].unique())
+    counts = items_df['pano'].value_counts()
+    for set_id in items_df['pano'].unique():
+        if set_id == -1 or set_id not in valid_pano_ids:
+            continue
+        count = counts[set_id]
+        for k in range(2, count + 1):
+            keys.append((set_id, k))
+    return keys
+
+
+def stat_coefficients(items_df, bonuses_df, bonus_vars, char):
+    """Returns the contribution of every item and every set bonus tier to `char`."""
+    item_coefs = items_df.set_index('id')[char].to_dict() if char in items_df.columns else {}
+
+    bonus_coefs = {}
+    bonus_rows = bonuses_df.drop_duplicates('id').set_index('id')
+    tier_columns = {}
+    for (set_id, k) in bonus_vars:
+        col_name = f"bonus_{k}_{char}"
+        if col_name not in bonus_rows.columns:
+            continue
+        if col_name not in tier_columns:
+            tier_columns[col_name] = bonus_rows[col_name].to_dict()
+        if set_id in tier_columns[col_name]:
+            bonus_coefs[(set_id, k)] = tier_columns[col_name][set_id]
+    return item_coefs, bonus_coefs
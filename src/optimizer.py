@@ -1,11 +1,24 @@
 import pandas as pd
 from pulp import LpMaximize, LpProblem, LpVariable, lpSum
-import re
 import argparse
 import glob
 from pathlib import Path
 from collections import defaultdict
 
+from equipment import (
+    CONDITION_CHARS,
+    CONDITION_CODES,
+    DOFUS_TROPHY_LIMIT,
+    DOFUS_TROPHY_TYPES,
+    GROUPED_TYPES,
+    PK_COND_REGEX,
+    STAT_COND_REGEX,
+    extract_conditions,
+    set_bonus_keys,
+    stat_coefficients,
+    type_limit,
+)
+
 
 def load_data():
     """Loads items and panoplies data from the data/processed directory."""
@@ -26,8 +39,34 @@ def load_data():
     return items_df, bonuses_df
 
 
-def main():
-    parser = argparse.ArgumentParser(description='Dofus Stuff Optimizer')
+CHAR_ID_TO_NAME = {
+    -1: "dommages Neutre", 10: "Force", 88: "Dommages Terre", 11: "Vitalité",
+    92: "Dommages Neutre", 15: "Intelligence", 78: "Fuite", 0: "Arme de chasse",
+    18: "% Critique", 14: "Agilité", 79: "Tacle", 23: "PM", 49: "Soins",
+    91: "Dommages Air", 12: "Sagesse", 13: "Chance", 48: "Prospection",
+    90: "Dommages Eau", 1: "PA", 44: "Initiative", 19: "Portée",
+    89: "Dommages Feu", 16: "Dommages", 25: "Puissance", 86: "Dommages Critiques",
+    87: "Résistances Critiques", 33: "% Résistance Terre", 26: "Invocations",
+    84: "Dommages Poussée", 37: "% Résistance Neutre", 82: "Retrait PA",
+    83: "Retrait PM", 34: "% Résistance Feu", 35: "% Résistance Eau",
+    36: "% Résistance Air", 58: "Résistances Neutre", 54: "Résistances Terre",
+    55: "Résistances Feu", 56: "Résistances Eau", 57: "Résistances Air",
+    28: "Esquive PM", 85: "Résistances Poussée", 40: "Pods", 27: "Esquive PA",
+    69: "Puissance Pièges", 70: "Dommages Pièges", 50: "Dommages Renvoyés",
+    124: "% Résistance mêlée", 121: "% Résistance distance",
+    122: "Dommages d'armes", 123: "Dommages aux sorts"
+}
+
+EQUIP_TYPES_MAP = {
+    16: "Chapeau", 17: "Cape", 9: "Anneau", 1: "Amulette", 3: "Baguette",
+    11: "Bottes", 10: "Ceinture", 7: "Marteau", 4: "Bâton", 2: "Arc",
+    5: "Dague", 6: "Épée", 19: "Hache", 22: "Faux", 8: "Pelle",
+    151: "Trophée", 23: "Dofus", 82: "Boucliers"
+}
+
+
+def build_arg_parser(description='Dofus Stuff Optimizer'):
+    parser = argparse.ArgumentParser(description=description)
     parser.add_argument('--min-level', type=int, default=1, help='Minimum character level')
     parser.add_argument('--max-level', type=int, default=200, help='Maximum character level')
     parser.add_argument('--pa', type=int, default=9, help='Desired PA')
@@ -37,37 +76,115 @@ def main():
     parser.add_argument('--base-stats', nargs='+', default=[], help='Base stats overrides (e.g., characteristic_1:7 characteristic_23:3)')
     parser.add_argument('--debug-pa-pm', action='store_true', help='Print PA/PM contributions (items, set bonuses, base)')
     parser.add_argument('--min-stats', nargs='+', default=[], help='Minimum stats constraints (e.g., characteristic_10:100 characteristic_13:300)')
-    
-    args = parser.parse_args()
-    
-    print("Loading data...")
-    items_df, bonuses_df = load_data()
-    print("Data loaded.")
+    return parser
+
+
+def parse_base_stats(raw_list):
+    """Parses `characteristic_X:value` (or `=`) pairs into a dict, skipping malformed entries."""
+    parsed = {}
+    for raw in raw_list:
+        if ':' in raw:
+            key, value = raw.split(':', 1)
+        elif '=' in raw:
+            key, value = raw.split('=', 1)
+        else:
+            continue
+        key = key.strip()
+        value = value.strip()
+        if not key:
+            continue
+        try:
+            parsed[key] = float(value)
+        except ValueError:
+            continue
+    return parsed
+
+
+def characteristic_columns(items_df):
+    """Returns the numeric `characteristic_X` columns, the only stats a weight or a minimum can target."""
+    return [
+        column for column in items_df.columns
+        if column.startswith('characteristic_') and pd.api.types.is_numeric_dtype(items_df[column])
+    ]
+
+
+def parse_weights(raw_list, characteristics):
+    """Parses `characteristic_X:weight` pairs into a dict, summing a characteristic given twice.
+
+    Unlike the base stats, a malformed pair or an unknown characteristic is an
+    error: skipping it would silently change the objective.
+    """
+    weights = {}
+    for raw in raw_list:
+        char, separator, value = raw.partition(':')
+        char = char.strip()
+        if not separator or not char:
+            raise ValueError(f"Poids invalide : {raw} (attendu <char>:<poids>)")
+        try:
+            weight = float(value)
+        except ValueError:
+            raise ValueError(f"Poids invalide : {raw} (attendu <char>:<poids>)") from None
+        if char not in characteristics:
+            raise ValueError(f"Caractéristique inconnue : {char}")
+        weights[char] = weights.get(char, 0) + weight
+    return weights
+
+
+def parse_time_limit(raw):
+    """Parses `--bnb-time-limit`: a number of seconds or 'auto'."""
+    if raw == 'auto':
+        return raw
+    try:
+        return float(raw)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Limite invalide : {raw} (attendu un nombre de secondes ou auto)") from None
+
+
+def default_base_stats(raw_list, max_level):
+    """Parses the base stats and fills in the default PA/PM of the character."""
+    base_stats = parse_base_stats(raw_list)
+    if 'characteristic_1' not in base_stats:
+        base_stats['characteristic_1'] = 7 if max_level >= 100 else 6
+    if 'characteristic_23' not in base_stats:
+        base_stats['characteristic_23'] = 3
+    return base_stats
 
+
+def filter_items(items_df, min_level, max_level, no_dofus):
+    """Keeps the items usable for the level range, minus the banned ones."""
     # Step 1: Filter items by level
-    items_df = items_df[(items_df['niveau'] >= args.min_level) & (items_df['niveau'] <= args.max_level)]
+    items_df = items_df[(items_df['niveau'] >= min_level) & (items_df['niveau'] <= max_level)]
 
     # Filter out banned items
     to_drop = [2155, 8575, 27265, 27266, 27267, 27268, 27278, 27280, 27282, 9031, 2447, 6713] 
     items_df = items_df[~items_df['id'].isin(to_drop)]
-    if args.no_dofus:
+    if no_dofus:
         items_df = items_df[items_df['type'] != 23]
+    return items_df
+
+
+def min_stat_label(char):
+    if char == 'characteristic_1':
+        return "Minimum_PA_Constraint"
+    if char == 'characteristic_23':
+        return "Minimum_PM_Constraint"
+    return f"Minimum_{char}_Constraint"
 
+
+def build_problem(items_df, bonuses_df, weights, base_stats, pa, pm, min_stats):
+    """Builds the ILP for the filtered items.
+
+    Returns the problem, the item and set bonus variables (keyed by item id and
+    by (set id, number of items) respectively) and the minimum stat rows keyed by
+    characteristic, so that callers can edit the model in place.
+    """
     # Step 2: Define ILP variables
     item_vars = {row['id']: LpVariable(f"item_{row['id']}", cat='Binary') for _, row in items_df.iterrows()}
 
-    bonus_vars = {}
-    unique_panos = items_df['pano'].unique()
-    
-    # Filter panos that are in bonuses_df
-    valid_pano_ids = bonuses_df['id'].unique()
-    filtered_panos = [pano for pano in unique_panos if pano != -1 and pano in valid_pano_ids]
-
-    for set_id in filtered_panos:
-        count = items_df[items_df['pano'] == set_id].shape[0]
-        if count >= 2:
-            for k in range(2, count + 1):
-                bonus_vars[set_id, k] = LpVariable(f"bonus_{set_id}_{k}", cat='Binary')
+    bonus_vars = {
+        (set_id, k): LpVariable(f"bonus_{set_id}_{k}", cat='Binary')
+        for set_id, k in set_bonus_keys(items_df, bonuses_df)
+    }
 
     # Step 3: Create the ILP problem
     problem = LpProblem("Optimal_Stuff_Combination", LpMaximize)
@@ -75,148 +192,67 @@ def main():
     # Step 4: Constraints on types
     type_groups = items_df.groupby('type')
     for item_type, group in type_groups:
-        limit = 1
-        if item_type == 9:
-            limit = 2
-        elif item_type in [151, 23]:
-            limit = 6
-        elif item_type in [3, 7, 4, 2, 5, 6, 19, 22, 8]:
+        if item_type in GROUPED_TYPES:
             continue
+        limit = type_limit(item_type)
 
         problem += lpSum(item_vars[item_id] for item_id in group['id']) <= limit, f"Type_{item_type}_Constraint"
 
-    grouped_types = [3, 7, 4, 2, 5, 6, 19, 22, 8]
     item_types = items_df.set_index('id')['type'].to_dict()
-    grouped_items = [item_id for item_id, item_type in item_types.items() if item_type in grouped_types]
+    grouped_items = [item_id for item_id, item_type in item_types.items() if item_type in GROUPED_TYPES]
     problem += lpSum(item_vars[item_id] for item_id in grouped_items) <= 1, "Grouped_Types_Constraint"
 
     # Combined cap for Dofus + Trophies
-    dofus_trophy_types = [151, 23]
-    dofus_trophy_items = [item_id for item_id, item_type in item_types.items() if item_type in dofus_trophy_types]
-    problem += lpSum(item_vars[item_id] for item_id in dofus_trophy_items) <= 6, "Dofus_Trophy_Combined_Constraint"
+    dofus_trophy_items = [item_id for item_id, item_type in item_types.items() if item_type in DOFUS_TROPHY_TYPES]
+    problem += lpSum(item_vars[item_id] for item_id in dofus_trophy_items) <= DOFUS_TROPHY_LIMIT, "Dofus_Trophy_Combined_Constraint"
 
     # Step 5: Constraints on bonuses
-    for set_id in filtered_panos:
-        count = items_df[items_df['pano'] == set_id].shape[0]
-        if count >= 2:
-            id_values = items_df[items_df['pano'] == set_id]['id'].tolist()
-            for k in range(2, count + 1):
-                problem += bonus_vars[(set_id, k)] <= lpSum(item_vars[item_id] for item_id in id_values) / k, f"Bonus_{set_id}_{k}_Constraint"
-    
-    # Step 6: Parse weights
-    characteristics_of_interest = [w.split(':')[0] for w in args.weights]
-    weights = [float(w.split(':')[1]) for w in args.weights]
-
-    # Step 7: Calculate weighted characteristics for items
-    item_characteristics = {
-        item_id: sum(row[char] * weight for char, weight in zip(characteristics_of_interest, weights))
-        for item_id, row in items_df.set_index('id').iterrows()
-    }
-
-    # Step 8: Calculate weighted characteristics for bonuses
-    bonus_characteristics = {}
-    for set_id in filtered_panos :
-        count = items_df[items_df['pano'] == set_id].shape[0]
-        if count >= 2:
-            for k in range(2, count + 1):
-                row = bonuses_df[bonuses_df['id'] == set_id]
-                if not row.empty:
-                    weighted_sum = 0
-                    for characteristic, weight in zip(characteristics_of_interest, weights):
-                        column_name = f"bonus_{k}_{characteristic}"
-                        if column_name in bonuses_df.columns:
-                            value = row[column_name].iloc[0]
-                            weighted_sum += value * weight
-                
-                    key = (set_id, k)
-                    bonus_characteristics[key] = weighted_sum
-    
-    # Step 9: Base stats
-    def parse_base_stats(raw_list):
-        parsed = {}
-        for raw in raw_list:
-            if ':' in raw:
-                key, value = raw.split(':', 1)
-            elif '=' in raw:
-                key, value = raw.split('=', 1)
-            else:
-                continue
-            key = key.strip()
-            value = value.strip()
-            if not key:
-                continue
-            try:
-                parsed[key] = float(value)
-            except ValueError:
-                continue
-        return parsed
-
-    base_stats = parse_base_stats(args.base_stats)
-
-    if 'characteristic_1' not in base_stats:
-        base_stats['characteristic_1'] = 7 if args.max_level >= 100 else 6
-    if 'characteristic_23' not in base_stats:
-        base_stats['characteristic_23'] = 3
+    set_items = items_df.groupby('pano')['id'].apply(list)
+    for set_id, k in bonus_vars:
+        id_values = set_items[set_id]
+        problem += bonus_vars[(set_id, k)] <= lpSum(item_vars[item_id] for item_id in id_values) / k, f"Bonus_{set_id}_{k}_Constraint"
+
+    # Step 7 & 8: Calculate weighted characteristics for items and bonuses
+    item_characteristics = {item_id: 0 for item_id in item_vars}
+    bonus_characteristics = {key: 0 for key in bonus_vars}
+    for char, weight in weights.items():
+        item_coefs, bonus_coefs = stat_coefficients(items_df, bonuses_df, bonus_vars, char)
+        for item_id, value in item_coefs.items():
+            item_characteristics[item_id] += value * weight
+        for key, value in bonus_coefs.items():
+            bonus_characteristics[key] += value * weight
 
     # Step 10: Generic minimum stat constraints (PA/PM + user-provided)
     def build_min_stat_constraint(problem_obj, char, minimum, label):
-        item_characteristics = {
-            item_id: row[char]
-            for item_id, row in items_df.set_index('id').iterrows()
-        }
-
-        bonus_characteristics = {}
-        for set_id in filtered_panos:
-            count = items_df[items_df['pano'] == set_id].shape[0]
-            if count >= 2:
-                for k in range(2, count + 1):
-                    row_bonus = bonuses_df[bonuses_df['id'] == set_id]
-                    if row_bonus.empty:
-                        continue
-                    col_name = f"bonus_{k}_{char}"
-                    if col_name in bonuses_df.columns:
-                        bonus_characteristics[(set_id, k)] = row_bonus[col_name].iloc[0]
-
-        problem_obj += (
+        item_coefs, bonus_coefs = stat_coefficients(items_df, bonuses_df, bonus_vars, char)
+
+        constraint = (
             lpSum(
-                item_vars[item_id] * item_characteristics.get(item_id, 0)
+                item_vars[item_id] * item_coefs.get(item_id, 0)
                 for item_id in item_vars
             ) +
             lpSum(
-                bonus_vars[key] * bonus_characteristics.get(key, 0)
+                bonus_vars[key] * bonus_coefs.get(key, 0)
                 for key in bonus_vars
-            ) + base_stats.get(char, 0) >= minimum, label
+            ) + base_stats.get(char, 0) >= minimum
         )
+        problem_obj += constraint, label
+        min_stat_rows[char] = constraint
 
     # Keep --pa and --pm (PA/PM)
-    build_min_stat_constraint(problem, "characteristic_1", args.pa, "Minimum_PA_Constraint")
-    build_min_stat_constraint(problem, "characteristic_23", args.pm, "Minimum_PM_Constraint")
+    min_stat_rows = {}
+    build_min_stat_constraint(problem, "characteristic_1", pa, min_stat_label("characteristic_1"))
+    build_min_stat_constraint(problem, "characteristic_23", pm, min_stat_label("characteristic_23"))
 
     # Additional minimum stats (exclude PA/PM)
-    min_stats = parse_base_stats(args.min_stats)
     for char, minimum in min_stats.items():
         if char in ("characteristic_1", "characteristic_23"):
             continue
         if char not in items_df.columns:
             continue
-        build_min_stat_constraint(problem, char, minimum, f"Minimum_{char}_Constraint")
+        build_min_stat_constraint(problem, char, minimum, min_stat_label(char))
     
     # Step 12: Condition parsing and constraints
-    table_1 = ['W', 'S', 'C', 'A', 'I', 'P', 'M', 'V']
-    table_2 = ['characteristic_12', 'characteristic_10', 'characteristic_13', 'characteristic_14', 'characteristic_15', 'characteristic_1', 'characteristic_23', 'characteristic_11']
-    code_to_char = dict(zip(table_1, table_2))
-
-    c_condition_regex = re.compile(r'\b(C[A-Za-z0-9]*)\s*(<=|>=|=|<|>)\s*([0-9]+)\b')
-    pk_condition_regex = re.compile(r'\b(Pk)\s*(<=|>=|=|<|>)\s*([0-9]+)\b')
-
-    def extract_conditions(condition_str):
-        if not isinstance(condition_str, str):
-            return []
-        normalized = condition_str.replace("|", "&")
-        c_matches = c_condition_regex.findall(normalized)
-        pk_matches = pk_condition_regex.findall(normalized)
-        return [f"{var}{op}{val}" for var, op, val in c_matches + pk_matches]
-
     unique_conditions = set()
     condition_to_items = defaultdict(set)
     for _, row in items_df.iterrows():
@@ -230,23 +266,13 @@ def main():
     unique_conditions = sorted(unique_conditions)
     condition_to_items = {cond: sorted(ids) for cond, ids in condition_to_items.items()}
 
-    stat_cond_regex = re.compile(r'^C([A-Za-z0-9]+)(<=|>=|=|<|>)(\d+)$')
-    pk_cond_regex = re.compile(r'^(Pk)(<=|>=|=|<|>)(\d+)$')
-
-    item_stat = {
-        char: items_df.set_index('id')[char].to_dict()
-        for char in table_2 if char in items_df.columns
-    }
-
-    bonus_stat = {char: {} for char in table_2}
-    for (set_id, k) in bonus_vars:
-        row = bonuses_df[bonuses_df['id'] == set_id]
-        if row.empty:
-            continue
-        for char in table_2:
-            col = f"bonus_{k}_{char}"
-            if col in bonuses_df.columns:
-                bonus_stat[char][(set_id, k)] = row[col].iloc[0]
+    item_stat = {}
+    bonus_stat = {char: {} for char in CONDITION_CHARS}
+    for char in CONDITION_CHARS:
+        item_coefs, bonus_coefs = stat_coefficients(items_df, bonuses_df, bonus_vars, char)
+        if char in items_df.columns:
+            item_stat[char] = item_coefs
+        bonus_stat[char] = bonus_coefs
 
     def total_stat_expr(char):
         return (
@@ -264,15 +290,15 @@ def main():
     z_vars = {cond: LpVariable(f"z_{idx}", cat='Binary') for idx, cond in enumerate(unique_conditions)}
 
     for cond in unique_conditions:
-        stat_match = stat_cond_regex.match(cond)
-        pk_match = pk_cond_regex.match(cond)
+        stat_match = STAT_COND_REGEX.match(cond)
+        pk_match = PK_COND_REGEX.match(cond)
         z = z_vars[cond]
 
         if stat_match:
             code, op, value_str = stat_match.groups()
-            if code not in code_to_char:
+            if code not in CONDITION_CODES:
                 continue
-            char = code_to_char[code]
+            char = CONDITION_CODES[code]
             if char not in item_stat:
                 continue
 
@@ -334,107 +360,166 @@ def main():
         bonus_vars[key] * bonus_characteristics[key] for key in bonus_vars
     ), "Total_Weighted_Stats"
 
-    # Step 12: Solve the problem
-    print("\nSolving the optimization problem...")
-    problem.solve()
-    print("Problem solved.")
+    return problem, item_vars, bonus_vars, min_stat_rows
 
-    # Step 13: Print the results
-    print("\nÉquipement optimal:")
-    
-    char_id_to_name = {
-        -1: "dommages Neutre", 10: "Force", 88: "Dommages Terre", 11: "Vitalité",
-        92: "Dommages Neutre", 15: "Intelligence", 78: "Fuite", 0: "Arme de chasse",
-        18: "% Critique", 14: "Agilité", 79: "Tacle", 23: "PM", 49: "Soins",
-        91: "Dommages Air", 12: "Sagesse", 13: "Chance", 48: "Prospection",
-        90: "Dommages Eau", 1: "PA", 44: "Initiative", 19: "Portée",
-        89: "Dommages Feu", 16: "Dommages", 25: "Puissance", 86: "Dommages Critiques",
-        87: "Résistances Critiques", 33: "% Résistance Terre", 26: "Invocations",
-        84: "Dommages Poussée", 37: "% Résistance Neutre", 82: "Retrait PA",
-        83: "Retrait PM", 34: "% Résistance Feu", 35: "% Résistance Eau",
-        36: "% Résistance Air", 58: "Résistances Neutre", 54: "Résistances Terre",
-        55: "Résistances Feu", 56: "Résistances Eau", 57: "Résistances Air",
-        28: "Esquive PM", 85: "Résistances Poussée", 40: "Pods", 27: "Esquive PA",
-        69: "Puissance Pièges", 70: "Dommages Pièges", 50: "Dommages Renvoyés",
-        124: "% Résistance mêlée", 121: "% Résistance distance",
-        122: "Dommages d'armes", 123: "Dommages aux sorts"
-    }
 
+def selected_solution(item_vars, bonus_vars):
+    """Returns the selected item ids and set bonus keys of the last solve."""
+    selected_items = [item_id for item_id, var in item_vars.items() if var.value() == 1]
+    selected_bonuses = [key for key, var in bonus_vars.items() if var.value() == 1]
+    return selected_items, selected_bonuses
+
+
+def stat_totals(items_df, bonuses_df, selected_items, selected_bonuses, stats_to_display, base_stats):
+    """Sums the displayed stats over the selected items, set bonuses and base stats."""
+    total_stats = {stat: 0 for stat in stats_to_display}
+
+    for item_id in selected_items:
+        item_data = items_df[items_df['id'] == item_id].iloc[0]
+        for char in stats_to_display:
+            if char in item_data:
+                total_stats[char] += item_data[char]
+
+    for set_id, k in selected_bonuses:
+        pano_data = bonuses_df[bonuses_df['id'] == set_id].iloc[0]
+        for char in stats_to_display:
+            col_name = f"bonus_{k}_{char}"
+            if col_name in pano_data:
+                total_stats[char] += pano_data[col_name]
+
+    # Add base stats
+    for char, value in base_stats.items():
+        total_stats[char] = total_stats.get(char, 0) + value
+    return total_stats
+
+
+def displayed_stats(characteristics_of_interest, base_stats):
     # Define stats to always display, plus the ones from the weights and base stats
     stats_to_display = set(['characteristic_1', 'characteristic_23', 'characteristic_19'])
     for char in characteristics_of_interest:
         stats_to_display.add(char)
     for char in base_stats.keys():
         stats_to_display.add(char)
+    return stats_to_display
 
-    total_stats = {stat: 0 for stat in stats_to_display}
 
-    equip_types_map = {
-        16: "Chapeau", 17: "Cape", 9: "Anneau", 1: "Amulette", 3: "Baguette",
-        11: "Bottes", 10: "Ceinture", 7: "Marteau", 4: "Bâton", 2: "Arc",
-        5: "Dague", 6: "Épée", 19: "Hache", 22: "Faux", 8: "Pelle",
-        151: "Trophée", 23: "Dofus", 82: "Boucliers"
-    }
+def char_name(char):
+    char_id = int(char.split('_')[1])
+    return CHAR_ID_TO_NAME.get(char_id, char)
+
+
+def describe_item(items_df, item_id):
+    item_data = items_df[items_df['id'] == item_id].iloc[0]
+    item_type_name = EQUIP_TYPES_MAP.get(item_data['type'], "Unknown Type")
+    return f"Item ID: {item_id}, Nom: {item_data['nom']}, Type: {item_type_name}"
 
-    selected_items = []
-    for item_id, var in item_vars.items():
-        if var.value() == 1:
-            item_data = items_df[items_df['id'] == item_id].iloc[0]
-            selected_items.append(item_data)
-            item_type_id = item_data['type']
-            item_type_name = equip_types_map.get(item_type_id, "Unknown Type")
-            print(f"- Item ID: {item_id}, Nom: {item_data['nom']}, Type: {item_type_name}")
-            for char in stats_to_display:
-                if char in item_data:
-                    total_stats[char] += item_data[char]
+
+def describe_bonus(bonuses_df, key):
+    set_id, k = key
+    pano_data = bonuses_df[bonuses_df['id'] == set_id].iloc[0]
+    return f"Panoplie: {pano_data['nom']}, Niveau: {k}"
+
+
+def print_results(items_df, bonuses_df, selected_items, selected_bonuses, total_stats):
+    print("\nÉquipement optimal:")
+    for item_id in selected_items:
+        print(f"- {describe_item(items_df, item_id)}")
 
     print("\nBonus panoplies:")
-    for (set_id, k), var in bonus_vars.items():
-        if var.value() == 1:
-            pano_data = bonuses_df[bonuses_df['id'] == set_id].iloc[0]
-            print(f"- Panoplie: {pano_data['nom']}, Niveau: {k}")
-            for char in stats_to_display:
-                col_name = f"bonus_{k}_{char}"
-                if col_name in pano_data:
-                    total_stats[char] += pano_data[col_name]
-    
+    for key in selected_bonuses:
+        print(f"- {describe_bonus(bonuses_df, key)}")
+
     print("\nStats totales:")
-    # Add base stats
-    for char, value in base_stats.items():
-        total_stats[char] = total_stats.get(char, 0) + value
-    
     for char, value in total_stats.items():
-        char_id = int(char.split('_')[1])
-        char_name = char_id_to_name.get(char_id, char)
-        print(f"- {char_name}: {value}")
+        print(f"- {char_name(char)}: {value}")
+
+
+def print_debug_pa_pm(items_df, bonuses_df, selected_items, selected_bonuses, base_stats):
+    pa_items = sum(items_df[items_df['id'] == item_id].iloc[0]['characteristic_1']
+                   for item_id in selected_items)
+    pm_items = sum(items_df[items_df['id'] == item_id].iloc[0]['characteristic_23']
+                   for item_id in selected_items)
+
+    pa_bonus = 0
+    pm_bonus = 0
+    for set_id, k in selected_bonuses:
+        pano_data = bonuses_df[bonuses_df['id'] == set_id].iloc[0]
+        col_pa = f"bonus_{k}_characteristic_1"
+        col_pm = f"bonus_{k}_characteristic_23"
+        if col_pa in pano_data:
+            pa_bonus += pano_data[col_pa]
+        if col_pm in pano_data:
+            pm_bonus += pano_data[col_pm]
+
+    print("\nDebug PA/PM breakdown:")
+    print(f"- PA items: {pa_items}")
+    print(f"- PA set bonuses: {pa_bonus}")
+    print(f"- PA base: {base_stats.get('characteristic_1', 0)}")
+    print(f"- PA total: {pa_items + pa_bonus + base_stats.get('characteristic_1', 0)}")
+    print(f"- PM items: {pm_items}")
+    print(f"- PM set bonuses: {pm_bonus}")
+    print(f"- PM base: {base_stats.get('characteristic_23', 0)}")
+    print(f"- PM total: {pm_items + pm_bonus + base_stats.get('characteristic_23', 0)}")
+
+
+def main():
+    parser = build_arg_parser()
+    parser.add_argument('--engine', choices=['pulp', 'bnb'], default='pulp', help='Solver: generic MIP (pulp) or slot-by-slot branch-and-bound (bnb)')
+    parser.add_argument(
+        '--bnb-time-limit', type=parse_time_limit, default='auto',
+        help="Seconds before the bnb engine gives up and falls back to pulp, or 'auto' to give the search as long as its set-up took"
+    )
+    args = parser.parse_args()
+    
+    print("Loading data...")
+    items_df, bonuses_df = load_data()
+    print("Data loaded.")
+
+    items_df = filter_items(items_df, args.min_level, args.max_level, args.no_dofus)
+
+    # Step 6: Parse weights
+    try:
+        weights = parse_weights(args.weights, characteristic_columns(items_df))
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Step 9: Base stats
+    base_stats = default_base_stats(args.base_stats, args.max_level)
+    min_stats = parse_base_stats(args.min_stats)
+
+    # Step 12: Solve the problem
+    print("\nSolving the optimization problem...")
+    solution = None
+    if args.engine == 'bnb':
+        from bnb import SearchTimeout, solve_branch_and_bound
+
+        try:
+            solution = solve_branch_and_bound(
+                items_df, bonuses_df, weights, base_stats, args.pa, args.pm, min_stats, args.bnb_time_limit
+            )
+        except SearchTimeout as e:
+            print(f"{e}, repli sur PuLP.")
+        else:
+            if solution is None:
+                print("Aucune solution ne respecte les contraintes.")
+                return
+            selected_items, selected_bonuses, _ = solution
+            print("Problem solved.")
+    if solution is None:
+        problem, item_vars, bonus_vars, _ = build_problem(
+            items_df, bonuses_df, weights, base_stats, args.pa, args.pm, min_stats
+        )
+        problem.solve()
+        print("Problem solved.")
+        selected_items, selected_bonuses = selected_solution(item_vars, bonus_vars)
+
+    # Step 13: Print the results
+    stats_to_display = displayed_stats(weights.keys(), base_stats)
+    total_stats = stat_totals(items_df, bonuses_df, selected_items, selected_bonuses, stats_to_display, base_stats)
+    print_results(items_df, bonuses_df, selected_items, selected_bonuses, total_stats)
 
     if args.debug_pa_pm:
-        pa_items = sum(items_df[items_df['id'] == item_id].iloc[0]['characteristic_1']
-                       for item_id, var in item_vars.items() if var.value() == 1)
-        pm_items = sum(items_df[items_df['id'] == item_id].iloc[0]['characteristic_23']
-                       for item_id, var in item_vars.items() if var.value() == 1)
-
-        pa_bonus = 0
-        pm_bonus = 0
-        for (set_id, k), var in bonus_vars.items():
-            if var.value() == 1:
-                pano_data = bonuses_df[bonuses_df['id'] == set_id].iloc[0]
-                col_pa = f"bonus_{k}_characteristic_1"
-                col_pm = f"bonus_{k}_characteristic_23"
-                if col_pa in pano_data:
-                    pa_bonus += pano_data[col_pa]
-                if col_pm in pano_data:
-                    pm_bonus += pano_data[col_pm]
-
-        print("\nDebug PA/PM breakdown:")
-        print(f"- PA items: {pa_items}")
-        print(f"- PA set bonuses: {pa_bonus}")
-        print(f"- PA base: {base_stats.get('characteristic_1', 0)}")
-        print(f"- PA total: {pa_items + pa_bonus + base_stats.get('characteristic_1', 0)}")
-        print(f"- PM items: {pm_items}")
-        print(f"- PM set bonuses: {pm_bonus}")
-        print(f"- PM base: {base_stats.get('characteristic_23', 0)}")
-        print(f"- PM total: {pm_items + pm_bonus + base_stats.get('characteristic_23', 0)}")
+        print_debug_pa_pm(items_df, bonuses_df, selected_items, selected_bonuses, base_stats)
 
 
 if __name__ == '__main__':
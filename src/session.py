@@ -0,0 +1,395 @@
+import json
+import shlex
+import sys
+import time
+
+from pulp import PULP_CBC_CMD, LpStatus, lpSum
+
+from equipment import stat_coefficients
+from optimizer import (
+    build_arg_parser,
+    build_problem,
+    char_name,
+    characteristic_columns,
+    default_base_stats,
+    describe_bonus,
+    describe_item,
+    displayed_stats,
+    filter_items,
+    load_data,
+    parse_base_stats,
+    parse_weights,
+    print_results,
+    selected_solution,
+    stat_totals,
+)
+
+
+HELP = """Commandes :
+  ban <id> [<id> ...]         Exclut des items
+  unban <id> [<id> ...]       Annule une exclusion
+  force <id> [<id> ...]       Impose des items
+  unforce <id> [<id> ...]     Annule une imposition
+  weight <char>:<poids> ...   Change un poids (0 pour le retirer)
+  min <char>:<valeur> ...     Change une stat minimale (PA/PM inclus)
+  unmin <char> [<char> ...]   Retire une stat minimale
+  pa <valeur> / pm <valeur>   Raccourcis pour les PA/PM minimaux
+  solve                       Relance la résolution sans modification
+  show                        Affiche la solution courante complète
+  help                        Affiche cette aide
+  quit                        Quitte la session"""
+
+JSON_KEYS = ('ban', 'unban', 'force', 'unforce', 'weights', 'min_stats', 'pa', 'pm')
+
+
+class Session:
+    """Keeps the data and the PuLP model in memory between solves.
+
+    Edits only touch the affected bounds, objective coefficients or rows, and
+    every solve is warm-started from the previous solution.
+    """
+
+    def __init__(self, items_df, bonuses_df, weights, base_stats, pa, pm, min_stats):
+        self.items_df = items_df
+        self.bonuses_df = bonuses_df
+        self.weights = dict(weights)
+        self.characteristics = set(characteristic_columns(items_df))
+        self.base_stats = base_stats
+        self.min_stats = {'characteristic_1': pa, 'characteristic_23': pm}
+        for char, minimum in min_stats.items():
+            if char not in ('characteristic_1', 'characteristic_23') and char in self.characteristics:
+                self.min_stats[char] = minimum
+
+        self.problem, self.item_vars, self.bonus_vars, self.min_stat_rows = build_problem(
+            items_df, bonuses_df, self.weights, base_stats, pa, pm, self.min_stats
+        )
+        self.previous = None
+
+    def _item_var(self, item_id):
+        var = self.item_vars.get(item_id)
+        if var is None:
+            raise ValueError(f"Item {item_id} absent des items filtrés")
+        return var
+
+    def _check_char(self, char):
+        if char not in self.characteristics:
+            raise ValueError(f"Caractéristique inconnue : {char}")
+
+    def _check_unset(self, char):
+        if char in ('characteristic_1', 'characteristic_23'):
+            raise ValueError("Les PA/PM minimaux ne peuvent pas être retirés, utilisez pa/pm")
+
+    def apply(self, edits):
+        """Applies (method, arguments) edits, all of them or, if one is invalid, none.
+
+        Every item id and characteristic is checked before the model is touched,
+        so that a failing request cannot leave it half edited.
+        """
+        for method, arguments in edits:
+            if method in ('ban', 'unban', 'force', 'unforce'):
+                self._item_var(arguments[0])
+            elif method == 'unset_min_stat':
+                self._check_char(arguments[0])
+                self._check_unset(arguments[0])
+            else:
+                self._check_char(arguments[0])
+        for method, arguments in edits:
+            getattr(self, method)(*arguments)
+
+    def ban(self, item_id):
+        self._item_var(item_id).upBound = 0
+
+    def unban(self, item_id):
+        self._item_var(item_id).upBound = 1
+
+    def force(self, item_id):
+        self._item_var(item_id).lowBound = 1
+
+    def unforce(self, item_id):
+        self._item_var(item_id).lowBound = 0
+
+    def set_weight(self, char, weight):
+        """Shifts the objective coefficients of the items and bonuses carrying `char`."""
+        self._check_char(char)
+        delta = weight - self.weights.get(char, 0)
+        item_coefs, bonus_coefs = stat_coefficients(self.items_df, self.bonuses_df, self.bonus_vars, char)
+        objective = self.problem.objective
+        for item_id, value in item_coefs.items():
+            if value:
+                var = self.item_vars[item_id]
+                objective[var] = objective.get(var, 0) + value * delta
+        for key, value in bonus_coefs.items():
+            if value:
+                var = self.bonus_vars[key]
+                objective[var] = objective.get(var, 0) + value * delta
+
+        if weight:
+            self.weights[char] = weight
+        else:
+            self.weights.pop(char, None)
+
+    def set_min_stat(self, char, minimum):
+        """Moves the right-hand side of the row for `char`, adding the row if needed."""
+        self._check_char(char)
+        constraint = self.min_stat_rows.get(char)
+        if constraint is None:
+            item_coefs, bonus_coefs = stat_coefficients(self.items_df, self.bonuses_df, self.bonus_vars, char)
+            constraint = (
+                lpSum(self.item_vars[item_id] * value for item_id, value in item_coefs.items()) +
+                lpSum(self.bonus_vars[key] * value for key, value in bonus_coefs.items()) +
+                self.base_stats.get(char, 0) >= minimum
+            )
+            self.problem += constraint, f"Session_Minimum_{char}_Constraint"
+            self.min_stat_rows[char] = constraint
+        else:
+            constraint.changeRHS(minimum - self.base_stats.get(char, 0))
+        self.min_stats[char] = minimum
+
+    def unset_min_stat(self, char):
+        """Relaxes the row for `char` to a bound that any selection satisfies.
+
+        The row is kept in the model so that a later `min` only moves its
+        right-hand side again.
+        """
+        self._check_char(char)
+        self._check_unset(char)
+        constraint = self.min_stat_rows.get(char)
+        if constraint is None or char not in self.min_stats:
+            return
+        item_coefs, bonus_coefs = stat_coefficients(self.items_df, self.bonuses_df, self.bonus_vars, char)
+        lowest = sum(min(0, value) for value in item_coefs.values())
+        lowest += sum(min(0, value) for value in bonus_coefs.values())
+        constraint.changeRHS(lowest)
+        del self.min_stats[char]
+
+    def solve(self):
+        """Re-solves the model and returns the changes from the previous solution."""
+        start = time.perf_counter()
+        self.problem.solve(PULP_CBC_CMD(msg=False, warmStart=self.previous is not None))
+        elapsed = time.perf_counter() - start
+
+        status = LpStatus[self.problem.status]
+        result = {'status': status, 'time': elapsed}
+        if status != 'Optimal':
+            return result
+
+        previous = self.previous or {'objective': 0, 'items': [], 'bonuses': [], 'stats': {}}
+        selected_items, selected_bonuses = selected_solution(self.item_vars, self.bonus_vars)
+        stats_to_display = displayed_stats(list(self.weights) + list(self.min_stats), self.base_stats)
+        # Stats that are no longer displayed are still compared, so that their change is reported
+        compared_stats = stat_totals(
+            self.items_df, self.bonuses_df, selected_items, selected_bonuses,
+            stats_to_display | set(previous['stats']), self.base_stats,
+        )
+        total_stats = {char: value for char, value in compared_stats.items() if char in stats_to_display}
+        current = {
+            'objective': self.problem.objective.value(),
+            'items': selected_items,
+            'bonuses': selected_bonuses,
+            'stats': total_stats,
+        }
+
+        result['objective'] = current['objective']
+        result['objective_delta'] = current['objective'] - previous['objective']
+        result['added_items'] = [i for i in selected_items if i not in previous['items']]
+        result['removed_items'] = [i for i in previous['items'] if i not in selected_items]
+        result['added_bonuses'] = [key for key in selected_bonuses if key not in previous['bonuses']]
+        result['removed_bonuses'] = [key for key in previous['bonuses'] if key not in selected_bonuses]
+        result['stat_changes'] = {
+            char: (previous['stats'].get(char, 0), value)
+            for char, value in compared_stats.items()
+            if value != previous['stats'].get(char, 0)
+        }
+        result['first'] = self.previous is None
+        self.previous = current
+        return result
+
+    def show(self):
+        if self.previous is None:
+            print("Aucune solution pour le moment.")
+            return
+        print_results(
+            self.items_df, self.bonuses_df, self.previous['items'], self.previous['bonuses'], self.previous['stats']
+        )
+
+
+def parse_pairs(arguments, usage):
+    """Parses `<char>:<valeur>` arguments, failing on the first malformed one."""
+    if not arguments or any(not parse_base_stats([raw]) for raw in arguments):
+        raise ValueError(f"Attendu : {usage}")
+    return parse_base_stats(arguments)
+
+
+def parse_command(command, arguments):
+    """Turns one edit command into a list of (method, arguments) edits, without touching the model."""
+    if command in ('ban', 'unban', 'force', 'unforce'):
+        try:
+            return [(command, (int(raw),)) for raw in arguments]
+        except ValueError:
+            raise ValueError(f"Attendu : {command} <id> [<id> ...]") from None
+    if command == 'weight':
+        weights = parse_pairs(arguments, "weight <char>:<poids>")
+        return [('set_weight', (char, weight)) for char, weight in weights.items()]
+    if command == 'min':
+        min_stats = parse_pairs(arguments, "min <char>:<valeur>")
+        return [('set_min_stat', (char, minimum)) for char, minimum in min_stats.items()]
+    if command == 'unmin':
+        return [('unset_min_stat', (char,)) for char in arguments]
+    if command in ('pa', 'pm'):
+        if len(arguments) != 1:
+            raise ValueError(f"Attendu : {command} <valeur>")
+        char = 'characteristic_1' if command == 'pa' else 'characteristic_23'
+        return [('set_min_stat', (char, float(arguments[0])))]
+    if command == 'solve':
+        return []
+    raise ValueError(f"Commande inconnue : {command}")
+
+
+def parse_json_request(request):
+    """Turns a JSON-lines request, e.g. {"ban": [737], "weights": {"characteristic_13": 1.0}}, into edits.
+
+    A `null` minimum in "min_stats" removes it, and an unknown key is an error.
+    """
+    if not isinstance(request, dict):
+        raise ValueError("Attendu : un objet JSON par ligne")
+    unknown = sorted(set(request) - set(JSON_KEYS))
+    if unknown:
+        raise ValueError(f"Clé(s) inconnue(s) : {', '.join(unknown)} (attendu : {', '.join(JSON_KEYS)})")
+    edits = []
+    for command in ('ban', 'unban', 'force', 'unforce'):
+        edits += [(command, (int(item_id),)) for item_id in request.get(command, [])]
+    edits += [('set_weight', (char, float(weight))) for char, weight in request.get('weights', {}).items()]
+    for char, minimum in request.get('min_stats', {}).items():
+        if minimum is None:
+            edits.append(('unset_min_stat', (char,)))
+        else:
+            edits.append(('set_min_stat', (char, float(minimum))))
+    if 'pa' in request:
+        edits.append(('set_min_stat', ('characteristic_1', float(request['pa']))))
+    if 'pm' in request:
+        edits.append(('set_min_stat', ('characteristic_23', float(request['pm']))))
+    return edits
+
+
+def print_diff(session, result):
+    print(f"\n{result['status']} en {result['time']:.2f} s")
+    if result['status'] != 'Optimal':
+        print("La solution précédente est conservée.")
+        return
+    if result['first']:
+        session.show()
+        print(f"\nObjectif : {result['objective']:.2f}")
+        return
+
+    print(f"Objectif : {result['objective']:.2f} ({result['objective_delta']:+.2f})")
+    if not (result['added_items'] or result['removed_items'] or result['added_bonuses'] or result['removed_bonuses']):
+        print("Équipement inchangé.")
+    for item_id in result['removed_items']:
+        print(f"- {describe_item(session.items_df, item_id)}")
+    for item_id in result['added_items']:
+        print(f"+ {describe_item(session.items_df, item_id)}")
+    for key in result['removed_bonuses']:
+        print(f"- {describe_bonus(session.bonuses_df, key)}")
+    for key in result['added_bonuses']:
+        print(f"+ {describe_bonus(session.bonuses_df, key)}")
+    for char, (old, new) in result['stat_changes'].items():
+        print(f"  {char_name(char)}: {old} -> {new} ({new - old:+})")
+
+
+def result_to_json(result):
+    """Converts a solve result to plain JSON types (pandas hands back NumPy scalars)."""
+    payload = {'status': result['status'], 'time': round(result['time'], 4)}
+    if result['status'] != 'Optimal':
+        return payload
+    payload['objective'] = float(result['objective'])
+    payload['objective_delta'] = float(result['objective_delta'])
+    payload['added_items'] = [int(i) for i in result['added_items']]
+    payload['removed_items'] = [int(i) for i in result['removed_items']]
+    payload['added_bonuses'] = [[int(set_id), int(k)] for set_id, k in result['added_bonuses']]
+    payload['removed_bonuses'] = [[int(set_id), int(k)] for set_id, k in result['removed_bonuses']]
+    payload['stat_changes'] = {
+        char: [float(old), float(new)] for char, (old, new) in result['stat_changes'].items()
+    }
+    return payload
+
+
+def run_repl(session):
+    print_diff(session, session.solve())
+    print("\nTapez 'help' pour la liste des commandes.")
+    while True:
+        try:
+            line = input("> ")
+        except EOFError:
+            break
+        try:
+            words = shlex.split(line)
+        except ValueError as e:
+            print(f"Erreur : {e}")
+            continue
+        if not words:
+            continue
+        command, arguments = words[0].lower(), words[1:]
+        if command in ('quit', 'exit'):
+            break
+        if command == 'help':
+            print(HELP)
+            continue
+        if command == 'show':
+            session.show()
+            continue
+        try:
+            session.apply(parse_command(command, arguments))
+        except ValueError as e:
+            print(f"Erreur : {e}")
+            continue
+        print_diff(session, session.solve())
+
+
+def run_json_lines(session):
+    print(json.dumps(result_to_json(session.solve())), flush=True)
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            session.apply(parse_json_request(json.loads(line)))
+        except (ValueError, TypeError, AttributeError) as e:
+            print(json.dumps({'error': str(e)}), flush=True)
+            continue
+        print(json.dumps(result_to_json(session.solve())), flush=True)
+
+
+def main():
+    parser = build_arg_parser(description='Dofus Stuff Optimizer - interactive session')
+    parser.add_argument('--json', action='store_true', help='Read JSON-lines requests on stdin and answer with JSON lines')
+    args = parser.parse_args()
+
+    log = sys.stderr if args.json else sys.stdout
+    print("Loading data...", file=log)
+    items_df, bonuses_df = load_data()
+    items_df = filter_items(items_df, args.min_level, args.max_level, args.no_dofus)
+    try:
+        weights = parse_weights(args.weights, characteristic_columns(items_df))
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.perf_counter()
+    session = Session(
+        items_df,
+        bonuses_df,
+        weights,
+        default_base_stats(args.base_stats, args.max_level),
+        args.pa,
+        args.pm,
+        parse_base_stats(args.min_stats),
+    )
+    print(f"Model built in {time.perf_counter() - start:.2f} s.", file=log)
+
+    if args.json:
+        run_json_lines(session)
+    else:
+        run_repl(session)
+
+
+if __name__ == '__main__':
+    main()